@@ -1,18 +1,96 @@
 import streamlit as st
 import requests
-import random
 import json
+import gc
+import atexit
 import re
 import os
+import html
+import hashlib
 import pickle
+import sqlite3
+import time
+import threading
+import msgspec
+import numpy as np
+import pandas as pd
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from collections import OrderedDict
+from contextlib import contextmanager
 from datetime import datetime, timedelta
-from bs4 import BeautifulSoup
+from pathlib import Path
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 # Load .env file if present
 load_dotenv()
 
+# Cache folders, created once here rather than checked on every write
+CACHE_DIR = "cache"
+GAME_DETAILS_CACHE_DIR = os.path.join(CACHE_DIR, "game_details")
+IMAGE_CACHE_DIR = os.path.join(CACHE_DIR, "images")
+Path(GAME_DETAILS_CACHE_DIR).mkdir(parents=True, exist_ok=True)
+Path(IMAGE_CACHE_DIR).mkdir(parents=True, exist_ok=True)
+
+# Cached libraries older than this get a refresh reminder
+GAMES_CACHE_MAX_AGE = timedelta(days=7).total_seconds()
+
+# Random generator used to pick games from the filtered library
+RNG = np.random.default_rng()
+
+# Bulk download request budget. Steam doesn't publish a limit for the Store
+# appdetails endpoint, but it is commonly reported to start answering 429 after
+# about 200 requests per 5 minutes per IP, so stay a little under that
+STEAM_REQUESTS_PER_SECOND = 180 / (5 * 60)
+STEAM_REQUEST_BURST = 10
+
 # --- Helper functions ---
+@st.cache_resource
+def get_http_session():
+    """Get the keep-alive HTTP session shared by all Steam requests"""
+    session = requests.Session()
+    session.headers.update({'User-Agent': 'steam-game-randomizer/1.0'})
+    # Pool enough connections for the bulk download workers, and let urllib3
+    # back off and retry when Steam answers a burst with 429/5xx
+    retries = Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503], raise_on_status=False)
+    adapter = HTTPAdapter(pool_connections=16, pool_maxsize=16, max_retries=retries)
+    session.mount('https://', adapter)
+    return session
+
+class RateLimiter:
+    """Token bucket shared by the bulk download workers"""
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a request may be sent"""
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            # Reserve the token now and sleep outside the lock for any deficit
+            self.tokens -= 1
+            wait_time = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait_time:
+            time.sleep(wait_time)
+
+@st.cache_resource
+def get_rate_limiter():
+    """Get the rate limiter shared by every bulk download"""
+    return RateLimiter(rate=STEAM_REQUESTS_PER_SECOND, burst=STEAM_REQUEST_BURST)
+
+def hash_secret(value):
+    """Hash string arguments for st.cache_data so the API key is never kept as-is"""
+    # Returns bytes: a str result would be passed through hash_funcs again
+    return hashlib.sha1(value.encode()).digest()
+
+# Identical library requests within 5 minutes share one fetch; Fetch Fresh Data clears it
+@st.cache_data(ttl=5*60, show_spinner=False, hash_funcs={str: hash_secret})
 def get_owned_games(api_key, steamid):
     url = "https://api.steampowered.com/IPlayerService/GetOwnedGames/v1/"
     params = {
@@ -21,132 +99,447 @@ def get_owned_games(api_key, steamid):
         "include_appinfo": True,
         "include_played_free_games": True
     }
-    response = requests.get(url, params=params)
+    response = get_http_session().get(url, params=params)
     if response.status_code != 200:
         raise Exception("Failed to fetch data from Steam API.")
-    data = response.json()
+    data = msgspec.json.decode(response.content)
     if 'response' not in data or 'games' not in data['response']:
         raise Exception("No games found or profile is private.")
     return data['response']['games']
 
+def fetch_game_details(app_id, session):
+    """Fetch game details from Steam Store API"""
+    url = "https://store.steampowered.com/api/appdetails"
+    params = {"appids": app_id}
+    response = session.get(url, params=params, timeout=10)
+    if response.status_code == 200:
+        data = msgspec.json.decode(response.content)
+        if str(app_id) in data and data[str(app_id)]['success']:
+            return data[str(app_id)]['data']
+    return None
+
+# Not wrapped in st.cache_data: successful fetches are saved to the details database,
+# so only failures would be cached, and those should be retried on the next roll
 def get_game_details(app_id):
     """Get additional game details from Steam Store API"""
     try:
-        url = f"https://store.steampowered.com/api/appdetails"
-        params = {"appids": app_id}
-        response = requests.get(url, params=params)
-        
-        if response.status_code == 200:
-            data = response.json()
-            if str(app_id) in data and data[str(app_id)]['success']:
-                return data[str(app_id)]['data']
+        return fetch_game_details(app_id, get_http_session())
     except Exception as e:
         st.warning(f"Could not fetch additional details: {e}")
     return None
 
+def fetch_for_games(fetch, games, max_workers=8):
+    """Run fetch(game) for many games concurrently, yielding (game, result) as each finishes"""
+    # Requests are I/O bound, so overlap them on a small pool sharing one
+    # keep-alive session; the rate limiter keeps the pool under Steam's budget
+    limiter = get_rate_limiter()
+    def limited_fetch(game):
+        limiter.acquire()
+        return fetch(game)
+    executor = ThreadPoolExecutor(max_workers=max_workers)
+    try:
+        futures = {executor.submit(limited_fetch, game): game for game in games}
+        for future in as_completed(futures):
+            try:
+                result = future.result()
+            except Exception:
+                result = None
+            yield futures[future], result
+    finally:
+        # If the caller stops early (e.g. a rerun mid-download), drop the queued
+        # fetches instead of blocking the script until they all finish
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def fetch_all_game_details(games, session):
+    """Fetch Store details for many games concurrently, yielding (game, details) as each finishes"""
+    return fetch_for_games(lambda game: fetch_game_details(game['appid'], session), games)
+
+class GameCache(msgspec.Struct):
+    """On-disk layout of the cached game library"""
+    games: list
+    timestamp: str
+    steamid: str
+
+class GameDetailsCache(msgspec.Struct):
+    """Layout of the legacy per-game details cache files"""
+    details: dict
+    timestamp: str
+    app_id: int
+
+@contextmanager
+def gc_paused():
+    """Pause cyclic garbage collection while decoding large caches"""
+    # Decoding a big library allocates thousands of containers, each batch of
+    # which would otherwise trigger a GC pass over everything allocated so far
+    was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if was_enabled:
+            gc.enable()
+
+def decode_cache(buf, cache_type):
+    """Decode a msgpack cache file, falling back to legacy pickle caches"""
+    # Pickle streams start with the PROTO opcode (0x80); our msgpack structs
+    # always start with a non-empty fixmap marker (0x81-0x8f)
+    if buf[:1] == b'\x80':
+        cache_data = pickle.loads(buf)
+        cache_data['timestamp'] = cache_data['timestamp'].isoformat()
+        return cache_type(**cache_data)
+    return msgspec.msgpack.decode(buf, type=cache_type)
+
+def write_cache_file(cache_file, data):
+    """Write a cache file atomically, so an interrupted write never leaves it truncated"""
+    tmp_file = cache_file + '.tmp'
+    Path(tmp_file).write_bytes(data)
+    os.replace(tmp_file, cache_file)
+
+def get_games_cache_file(steamid):
+    """Get the path of the cached game library for a SteamID"""
+    return os.path.join(CACHE_DIR, f"games_{steamid}.msgpack")
+
+def get_games_cache_mtime(steamid):
+    """Get when the cached library was last written, or None if there is none"""
+    try:
+        return os.stat(get_games_cache_file(steamid)).st_mtime
+    except FileNotFoundError:
+        return None
+
 def save_cache_data(games, steamid):
     """Save games data to local cache"""
-    cache_dir = "cache"
-    if not os.path.exists(cache_dir):
-        os.makedirs(cache_dir)
-    
-    cache_file = os.path.join(cache_dir, f"games_{steamid}.pkl")
-    cache_data = {
-        'games': games,
-        'timestamp': datetime.now(),
-        'steamid': steamid
-    }
-    
-    with open(cache_file, 'wb') as f:
-        pickle.dump(cache_data, f)
+    cache_file = get_games_cache_file(steamid)
+    cache_data = GameCache(
+        games=games,
+        timestamp=datetime.now().isoformat(),
+        steamid=steamid
+    )
+    write_cache_file(cache_file, msgspec.msgpack.encode(cache_data))
     
     st.success(f"Game data cached locally for offline use!")
 
 def load_cache_data(steamid):
     """Load games data from local cache"""
-    cache_file = os.path.join("cache", f"games_{steamid}.pkl")
+    cache_file = get_games_cache_file(steamid)
+    legacy_file = os.path.join(CACHE_DIR, f"games_{steamid}.pkl")
+    if not os.path.exists(cache_file) and os.path.exists(legacy_file):
+        # Older versions wrote the library as games_<id>.pkl; read it once and rewrite it below
+        cache_file = legacy_file
     
     if os.path.exists(cache_file):
-        with open(cache_file, 'rb') as f:
-            cache_data = pickle.load(f)
+        try:
+            with gc_paused():
+                cache_data = decode_cache(Path(cache_file).read_bytes(), GameCache)
+            timestamp = datetime.fromisoformat(cache_data.timestamp)
+        except (EOFError, ValueError, msgspec.DecodeError, pickle.UnpicklingError):
+            # A corrupt cache can't be recovered; drop it so the next fetch rewrites it
+            os.remove(cache_file)
+            st.warning("Cached game data was corrupt and has been removed. Please fetch your library again.")
+            return None, None
         
-        # Check if cache is less than 7 days old
-        if datetime.now() - cache_data['timestamp'] < timedelta(days=7):
-            return cache_data['games'], cache_data['timestamp']
-        else:
-            st.warning("Cache is older than 7 days. Consider refreshing.")
-            return cache_data['games'], cache_data['timestamp']
+        if cache_file == legacy_file:
+            new_file = get_games_cache_file(steamid)
+            write_cache_file(new_file, msgspec.msgpack.encode(cache_data))
+            # Carry the fetch time over, since freshness is judged by the file's mtime
+            os.utime(new_file, (timestamp.timestamp(), timestamp.timestamp()))
+            os.remove(legacy_file)
+        
+        return cache_data.games, timestamp
     
     return None, None
 
-def save_game_details_cache(game_details, app_id):
-    """Save individual game details to cache"""
-    cache_dir = "cache/game_details"
-    if not os.path.exists(cache_dir):
-        os.makedirs(cache_dir)
-    
-    cache_file = os.path.join(cache_dir, f"game_{app_id}.pkl")
-    cache_data = {
-        'details': game_details,
-        'timestamp': datetime.now(),
-        'app_id': app_id
-    }
+def save_rolled_games(rolled_games, steamid):
+    """Save the rolled games so exclusions survive closing the app"""
+    cache_file = os.path.join(CACHE_DIR, f"rolled_{steamid}.msgpack")
+    write_cache_file(cache_file, msgspec.msgpack.encode(sorted(rolled_games)))
+
+def load_rolled_games(steamid):
+    """Load the saved rolled games for a SteamID"""
+    cache_file = os.path.join(CACHE_DIR, f"rolled_{steamid}.msgpack")
+    if os.path.exists(cache_file):
+        return set(msgspec.msgpack.decode(Path(cache_file).read_bytes(), type=list[int]))
+    return set()
+
+DETAILS_DB_PATH = os.path.join(CACHE_DIR, "game_details.sqlite")
+DETAILS_MAX_AGE = timedelta(days=30).total_seconds()
+DETAILS_MEMORY_CACHE_SIZE = 500
+DB_COMMIT_BATCH = 200
+DB_COMMIT_INTERVAL = 5  # seconds
+ACHIEVEMENTS_TABLE = "achievements"
+PLAYER_ACHIEVEMENTS_TABLE = "player_achievements"
+LEGACY_DETAILS_FILE_RE = re.compile(r'game_(\d+)\.pkl')
+LEGACY_ACHIEVEMENTS_FILE_RE = re.compile(r'game_(\d+)_(achievements|player_achievements)\.pkl')
+
+@st.cache_resource
+def get_details_db():
+    """Open the game details database shared by all sessions, creating it if needed"""
+    conn = sqlite3.connect(DETAILS_DB_PATH, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    for table in ("details", ACHIEVEMENTS_TABLE, PLAYER_ACHIEVEMENTS_TABLE):
+        conn.execute(f"CREATE TABLE IF NOT EXISTS {table} (appid INTEGER PRIMARY KEY, blob BLOB NOT NULL, ts REAL NOT NULL)")
+    # Databases from before the genres projection column get it added here
+    if 'genres' not in {row[1] for row in conn.execute("PRAGMA table_info(details)")}:
+        conn.execute("ALTER TABLE details ADD COLUMN genres BLOB")
+    migrate_legacy_details_cache(conn)
+    backfill_genres_column(conn)
+    # Safety net for a bulk download cut short by shutdown between batch commits
+    atexit.register(conn.commit)
+    return conn
+
+class WriteCounter:
+    """Count writes to a table, so caches built from it can be keyed on the count"""
+    def __init__(self):
+        self.value = 0
+        self.lock = threading.Lock()
+
+    def bump(self):
+        """Record one more write"""
+        with self.lock:
+            self.value += 1
+
+@st.cache_resource
+def get_details_write_counter():
+    """Get the process-wide counter of writes to the details table"""
+    return WriteCounter()
+
+class BatchCommitter:
+    """Commit bulk download writes every DB_COMMIT_BATCH rows or DB_COMMIT_INTERVAL seconds"""
+    def __init__(self, conn):
+        self.conn = conn
+        self.pending = 0
+        self.last_commit = time.monotonic()
+
+    def add(self):
+        """Count one staged write, committing if the batch is full or old enough"""
+        self.pending += 1
+        if self.pending >= DB_COMMIT_BATCH or time.monotonic() - self.last_commit > DB_COMMIT_INTERVAL:
+            self.commit()
+
+    def commit(self):
+        """Commit everything staged so far"""
+        self.conn.commit()
+        self.pending = 0
+        self.last_commit = time.monotonic()
+
+def project_genres(game_details):
+    """Encode just the genre names of a game's details, for the genres column"""
+    return msgspec.msgpack.encode([genre['description'] for genre in game_details.get('genres', [])])
+
+def backfill_genres_column(conn):
+    """Fill in the genres column for rows saved before it existed"""
+    rows = conn.execute("SELECT appid, blob FROM details WHERE genres IS NULL").fetchall()
+    with conn:
+        conn.executemany(
+            "UPDATE details SET genres = ? WHERE appid = ?",
+            [(project_genres(msgspec.msgpack.decode(blob)), app_id) for app_id, blob in rows]
+        )
+    if rows:
+        get_details_write_counter().bump()
+
+def migrate_legacy_details_cache(conn):
+    """Move per-game details and achievements files from older versions into the details database"""
+    rows = {"details": [], ACHIEVEMENTS_TABLE: [], PLAYER_ACHIEVEMENTS_TABLE: []}
+    legacy_files = []
+    for entry in os.scandir(GAME_DETAILS_CACHE_DIR):
+        if LEGACY_DETAILS_FILE_RE.fullmatch(entry.name):
+            # Files that fail to decode are still removed below, so a truncated one can't block the rest
+            legacy_files.append(entry.path)
+            try:
+                with gc_paused():
+                    cache_data = decode_cache(Path(entry.path).read_bytes(), GameDetailsCache)
+                timestamp = datetime.fromisoformat(cache_data.timestamp).timestamp()
+            except (EOFError, ValueError, msgspec.DecodeError, pickle.UnpicklingError):
+                continue
+            rows["details"].append((cache_data.app_id, msgspec.msgpack.encode(cache_data.details), timestamp))
+        elif match := LEGACY_ACHIEVEMENTS_FILE_RE.fullmatch(entry.name):
+            # Achievement files were bare pickled lists, so their age comes from the file itself
+            legacy_files.append(entry.path)
+            try:
+                achievements = pickle.loads(Path(entry.path).read_bytes())
+            except (EOFError, ValueError, msgspec.DecodeError, pickle.UnpicklingError):
+                continue
+            rows[match.group(2)].append((int(match.group(1)), msgspec.msgpack.encode(achievements), entry.stat().st_mtime))
     
-    with open(cache_file, 'wb') as f:
-        pickle.dump(cache_data, f)
+    with conn:
+        for table, table_rows in rows.items():
+            conn.executemany(f"INSERT OR IGNORE INTO {table} (appid, blob, ts) VALUES (?, ?, ?)", table_rows)
+    for path in legacy_files:
+        os.remove(path)
+
+class DetailsMemoryCache:
+    """LRU of recently loaded game details, keyed by app id and shared by all sessions"""
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, app_id):
+        """Get a cached (details, timestamp) entry, marking it as recently used"""
+        with self.lock:
+            entry = self.entries.get(app_id)
+            if entry is not None:
+                self.entries.move_to_end(app_id)
+            return entry
+
+    def put(self, app_id, entry):
+        """Cache an entry, evicting the least recently used one if full"""
+        with self.lock:
+            self.entries[app_id] = entry
+            if len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def discard(self, app_id):
+        """Drop an entry if it is cached"""
+        with self.lock:
+            self.entries.pop(app_id, None)
+
+@st.cache_resource
+def get_details_memory_cache():
+    """Get the process-wide LRU of recently loaded game details"""
+    return DetailsMemoryCache(DETAILS_MEMORY_CACHE_SIZE)
+
+def save_game_details_cache(game_details, app_id, commit=True):
+    """Save individual game details to cache"""
+    # With commit=False the caller batches saves through a BatchCommitter
+    conn = get_details_db()
+    conn.execute(
+        "INSERT OR REPLACE INTO details (appid, blob, ts, genres) VALUES (?, ?, ?, ?)",
+        (app_id, msgspec.msgpack.encode(game_details), time.time(), project_genres(game_details))
+    )
+    if commit:
+        conn.commit()
+    get_details_write_counter().bump()
+    get_details_memory_cache().discard(app_id)
 
 def load_game_details_cache(app_id):
     """Load individual game details from cache"""
-    cache_file = os.path.join("cache/game_details", f"game_{app_id}.pkl")
+    memory_cache = get_details_memory_cache()
+    entry = memory_cache.get(app_id)
+    if entry is None:
+        row = get_details_db().execute("SELECT blob, ts FROM details WHERE appid = ?", (app_id,)).fetchone()
+        # Stale rows are skipped from their timestamp alone, without decoding the blob
+        if row is None or time.time() - row[1] >= DETAILS_MAX_AGE:
+            return None
+        entry = (msgspec.msgpack.decode(row[0]), row[1])
+        memory_cache.put(app_id, entry)
     
-    if os.path.exists(cache_file):
-        with open(cache_file, 'rb') as f:
-            cache_data = pickle.load(f)
-        
-        # Check if cache is less than 30 days old
-        if datetime.now() - cache_data['timestamp'] < timedelta(days=30):
-            return cache_data['details']
+    # Check if cache is less than 30 days old
+    game_details, timestamp = entry
+    if time.time() - timestamp < DETAILS_MAX_AGE:
+        return game_details
     
     return None
 
+def save_achievements_cache(table, achievements, app_id, commit=True):
+    """Save a game's achievement schema or player progress to the details database"""
+    conn = get_details_db()
+    conn.execute(
+        f"INSERT OR REPLACE INTO {table} (appid, blob, ts) VALUES (?, ?, ?)",
+        (app_id, msgspec.msgpack.encode(achievements), time.time())
+    )
+    if commit:
+        conn.commit()
+
+def load_achievements_cache(table, app_id):
+    """Load a game's achievement schema or player progress from the details database"""
+    row = get_details_db().execute(f"SELECT blob FROM {table} WHERE appid = ?", (app_id,)).fetchone()
+    return msgspec.msgpack.decode(row[0]) if row else None
+
+def get_cached_achievement_ids(table):
+    """Get the app ids with cached achievement data in one query"""
+    return {app_id for (app_id,) in get_details_db().execute(f"SELECT appid FROM {table}")}
+
+def iter_cache_file_sizes(path):
+    """Yield the size of every file under path, reusing scandir's directory entries"""
+    for entry in os.scandir(path):
+        if entry.is_dir():
+            yield from iter_cache_file_sizes(entry.path)
+        else:
+            yield entry.stat().st_size
+
+def get_cache_stats(cache_dir=CACHE_DIR):
+    """Get the number of cached files and their total size in bytes"""
+    if not os.path.exists(cache_dir):
+        return 0, 0
+    sizes = list(iter_cache_file_sizes(cache_dir))
+    return len(sizes), sum(sizes)
+
+def get_cached_detail_ids():
+    """Get the app ids with fresh cached details, using one query instead of a lookup per game"""
+    rows = get_details_db().execute("SELECT appid FROM details WHERE ts > ?", (time.time() - DETAILS_MAX_AGE,))
+    return {app_id for (app_id,) in rows}
+
+def find_games_missing_details(games):
+    """Get the games that have no cached Store details yet"""
+    cached_ids = get_cached_detail_ids()
+    return [game for game in games if game.get('appid') and game['appid'] not in cached_ids]
+
+def build_games_frame(games):
+    """Build a columnar view of the library for vectorized filtering (row index = position in games)"""
+    # fromiter fills compact int32 columns directly instead of going through Python lists
+    return pd.DataFrame({
+        'appid': np.fromiter((game.get('appid', 0) for game in games), dtype=np.int32, count=len(games)),
+        'playtime_forever': np.fromiter((game.get('playtime_forever', 0) for game in games), dtype=np.int32, count=len(games)),
+    })
+
+def set_games(games, cache_key=None):
+    """Store the game library in session state together with its columnar view"""
+    # cache_key identifies the library file the games were loaded from, if any
+    st.session_state.games = games
+    st.session_state.games_df = build_games_frame(games) if games else None
+    st.session_state.games_cache_key = cache_key
+
 # Filter helpers
-def filter_games_by_playtime(games, max_hours):
-    """Filter games with less than max_hours of playtime"""
-    filtered_games = []
-    for game in games:
-        playtime_minutes = game.get('playtime_forever', 0)
-        playtime_hours = playtime_minutes / 60
-        if playtime_hours < max_hours:
-            filtered_games.append(game)
-    return filtered_games
-
-def get_available_genres(games):
+# Each returns a boolean array over the library rows, so filters combine with & / ~
+def get_playtime_mask(games_df, max_hours):
+    """Mark games with less than max_hours of playtime"""
+    return games_df['playtime_forever'].to_numpy() < max_hours * 60
+
+def get_rolled_mask(games_df, rolled_games):
+    """Mark games that were already rolled"""
+    rolled_ids = np.fromiter(rolled_games, dtype=np.int64, count=len(rolled_games))
+    return np.isin(games_df['appid'].to_numpy(), rolled_ids)
+
+@st.cache_resource(ttl=60*60, max_entries=1, show_spinner=False)
+def load_genres_snapshot(details_version):
+    """Decode the genres of all fresh cached games with a single query"""
+    # Only the small genres column is read; full details blobs stay untouched
+    rows = get_details_db().execute("SELECT appid, genres FROM details WHERE ts > ?", (time.time() - DETAILS_MAX_AGE,))
+    with gc_paused():
+        return {app_id: msgspec.msgpack.decode(genres, type=list[str]) for app_id, genres in rows}
+
+def load_all_game_genres():
+    """Get the genre names of every fresh cached game, keyed by app id"""
+    # Keyed on writes to the details table only, so achievement saves don't
+    # force a rebuild; the snapshot is only rebuilt after details were saved
+    return load_genres_snapshot(get_details_write_counter().value)
+
+@st.cache_resource(max_entries=4, show_spinner=False)
+def build_genre_index(games_fingerprint, details_version, _app_ids):
+    """Map each genre to the set of library app ids that have it"""
+    all_genres = load_all_game_genres()
+    index = {}
+    for app_id in _app_ids:
+        for genre in all_genres.get(app_id, ()):
+            index.setdefault(genre, set()).add(app_id)
+    return index
+
+def get_genre_index(games_df):
+    """Get the genre index for a library, rebuilt only when the library or cached details change"""
+    app_ids = games_df['appid'].to_numpy()
+    return build_genre_index(hash(app_ids.tobytes()), get_details_write_counter().value, app_ids.tolist())
+
+def get_available_genres(games_df):
     """Get all available genres from cached game details"""
-    genres = set()
-    for game in games:
-        app_id = game.get('appid')
-        if app_id:
-            game_details = load_game_details_cache(app_id)
-            if game_details and 'genres' in game_details:
-                for genre in game_details['genres']:
-                    genres.add(genre['description'])
-    return sorted(list(genres))
-
-def filter_games_by_genre(games, selected_genre):
-    """Filter games by selected genre"""
+    return sorted(get_genre_index(games_df))
+
+def get_genre_mask(games_df, selected_genre, genre_index):
+    """Mark games in the selected genre"""
     if selected_genre == "All Genres":
-        return games
-    
-    filtered_games = []
-    for game in games:
-        app_id = game.get('appid')
-        if app_id:
-            game_details = load_game_details_cache(app_id)
-            if game_details and 'genres' in game_details:
-                game_genres = [genre['description'] for genre in game_details['genres']]
-                if selected_genre in game_genres:
-                    filtered_games.append(game)
-    return filtered_games
+        return np.ones(len(games_df), dtype=bool)
+    genre_ids = np.fromiter(genre_index.get(selected_genre, ()), dtype=np.int64)
+    return np.isin(games_df['appid'].to_numpy(), genre_ids)
 
 def get_game_image_url(app_id):
     """Get game header image URL"""
@@ -156,64 +549,263 @@ def get_game_banner_url(app_id):
     """Get game banner image URL (using header for faster loading)"""
     return f"https://cdn.cloudflare.steamstatic.com/steam/apps/{app_id}/header.jpg"
 
+def get_cached_image_path(app_id, download=True):
+    """Get a local copy of a game's header image, downloading it when missing or stale"""
+    image_file = os.path.join(IMAGE_CACHE_DIR, f"{app_id}_header.jpg")
+    try:
+        is_fresh = time.time() - os.stat(image_file).st_mtime < DETAILS_MAX_AGE
+        has_copy = True
+    except FileNotFoundError:
+        is_fresh = has_copy = False
+    
+    if download and not is_fresh:
+        # Revalidate a stale copy with its ETag; the CDN answers 304 with no body if unchanged
+        etag_file = image_file + '.etag'
+        headers = {}
+        if has_copy and os.path.exists(etag_file):
+            headers['If-None-Match'] = Path(etag_file).read_text()
+        try:
+            response = get_http_session().get(get_game_image_url(app_id), headers=headers, timeout=10)
+            if response.status_code == 304:
+                os.utime(image_file)
+            elif response.status_code == 200:
+                write_cache_file(image_file, response.content)
+                if 'ETag' in response.headers:
+                    write_cache_file(etag_file, response.headers['ETag'].encode())
+                has_copy = True
+        except requests.RequestException:
+            pass  # Keep showing the old copy, if any
+    return image_file if has_copy else None
+
+# Patterns used by clean_html_text, compiled once instead of on every call
+_TAG_RE = re.compile(r'<[^>]+>')
+_WHITESPACE_RE = re.compile(r'\s+')
+_DUP_HEADER_RE = re.compile(r'(Minimum:|Recommended:|Optimal:)\s*\1')
+# Broken words, in one pass: "G H z" -> "GHz" (pairs of capitals, like the old
+# per-rule pass), and "1 G B" / "2 . 2" -> digit joined to the next letter
+_BROKEN_WORD_RE = re.compile(r'([A-Z]) ([A-Z])|(?<=[0-9]) (?=[A-Za-z])')
+_SECTION_RE = re.compile(r'(OS|Processor|Memory|Graphics|Storage|DirectX|Network|Sound|Additional):')
+
+# Cached across reruns: the same requirements/languages blobs are cleaned on
+# every rerun while a game is shown
+@st.cache_data(max_entries=4096, show_spinner=False)
 def clean_html_text(html_text):
     """Clean HTML tags from text"""
     if not html_text:
         return ""
-    # Remove HTML tags
-    soup = BeautifulSoup(html_text, 'html.parser')
-    text = soup.get_text()
+    # Remove HTML tags (Steam only sends simple markup, so no need for a full parser)
+    text = html.unescape(_TAG_RE.sub('', html_text))
     
     # Clean up the text properly
     # Replace multiple spaces with single space
-    text = re.sub(r'\s+', ' ', text)
+    text = _WHITESPACE_RE.sub(' ', text)
     
     # Fix common formatting issues
     # Remove duplicate section headers
-    text = re.sub(r'(Minimum:|Recommended:|Optimal:)\s*\1', r'\1', text)
+    text = _DUP_HEADER_RE.sub(r'\1', text)
     
-    # Fix broken words and spacing
-    text = re.sub(r'([A-Z])\s+([A-Z])', r'\1\2', text)  # Fix "G H z" -> "GHz"
-    text = re.sub(r'([a-z])\s+([A-Z])', r'\1 \2', text)  # Fix "M emory" -> "Memory"
-    text = re.sub(r'([0-9])\s+([A-Z])', r'\1\2', text)  # Fix "1 G B" -> "1GB"
-    text = re.sub(r'([0-9])\s+([a-z])', r'\1\2', text)  # Fix "2 . 2" -> "2.2"
+    # Fix broken words and spacing (whitespace is already single spaces here,
+    # so only the joining rules change anything)
+    text = _BROKEN_WORD_RE.sub(r'\1\2', text)
     
-    # Add proper line breaks for requirements
-    text = re.sub(r'(OS|Processor|Memory|Graphics|Storage|DirectX|Network|Sound|Additional):', r'\n\1:', text)
-    
-    # Clean up multiple line breaks and spaces
-    text = re.sub(r'\n\s*\n', '\n\n', text)
-    text = re.sub(r' +', ' ', text)
+    # Add proper line breaks for requirements (these never produce blank lines
+    # or repeated spaces, so no clean-up pass is needed afterwards)
+    text = _SECTION_RE.sub(r'\n\1:', text)
     
     return text.strip()
 
-def get_achievement_schema(api_key, app_id):
+def is_permanent_failure(response):
+    """Check whether a failed Steam Web API response won't succeed on retry"""
+    # 4xx other than 429 mean there is nothing to fetch; 429/5xx are worth retrying
+    return 400 <= response.status_code < 500 and response.status_code != 429
+
+def fetch_achievement_schema(api_key, app_id, session):
     """Fetch the achievement schema for a game (list of all achievements)"""
     url = "https://api.steampowered.com/ISteamUserStats/GetSchemaForGame/v2/"
     params = {"key": api_key, "appid": app_id}
-    try:
-        response = requests.get(url, params=params)
-        if response.status_code == 200:
-            data = response.json()
-            achievements = data.get("game", {}).get("availableGameStats", {}).get("achievements", [])
-            return achievements
-    except Exception as e:
-        st.warning(f"Could not fetch achievement schema: {e}")
+    response = session.get(url, params=params, timeout=10)
+    if response.status_code == 200:
+        data = msgspec.json.decode(response.content)
+        return data.get("game", {}).get("availableGameStats", {}).get("achievements", [])
+    if is_permanent_failure(response):
+        return []
     return None
 
-def get_player_achievements(api_key, steamid, app_id):
+def fetch_player_achievements(api_key, steamid, app_id, session):
     """Fetch the player's unlocked achievements for a game"""
     url = "https://api.steampowered.com/ISteamUserStats/GetPlayerAchievements/v1/"
     params = {"key": api_key, "steamid": steamid, "appid": app_id}
+    response = session.get(url, params=params, timeout=10)
+    if response.status_code == 200:
+        data = msgspec.json.decode(response.content)
+        return data.get("playerstats", {}).get("achievements", [])
+    if is_permanent_failure(response):
+        # 400 for games without stats, 403 for private profiles
+        return []
+    return None
+
+# Cached so re-showing a game doesn't hit the API again; results are also written
+# through to the details database for Offline Mode. Transient failures raise
+# instead of returning None, so st.cache_data never keeps them; permanent ones
+# come back as [] and are cached like any other answer
+@st.cache_data(ttl=60*60, show_spinner=False, hash_funcs={str: hash_secret})
+def get_achievement_schema(api_key, app_id):
+    """Fetch the achievement schema for a game (list of all achievements)"""
+    schema = fetch_achievement_schema(api_key, app_id, get_http_session())
+    if schema is None:
+        raise Exception("Failed to fetch data from Steam API.")
+    if schema:
+        save_achievements_cache(ACHIEVEMENTS_TABLE, schema, app_id)
+    return schema
+
+@st.cache_data(ttl=60*60, show_spinner=False, hash_funcs={str: hash_secret})
+def get_player_achievements(api_key, steamid, app_id):
+    """Fetch the player's unlocked achievements for a game"""
+    player_achievements = fetch_player_achievements(api_key, steamid, app_id, get_http_session())
+    if player_achievements is None:
+        raise Exception("Failed to fetch data from Steam API.")
+    if player_achievements:
+        save_achievements_cache(PLAYER_ACHIEVEMENTS_TABLE, player_achievements, app_id)
+    return player_achievements
+
+def get_achievements_online(api_key, steamid, app_id):
+    """Get a game's achievement schema and player progress, falling back to the details database"""
+    try:
+        schema = get_achievement_schema(api_key, app_id)
+    except Exception as e:
+        st.warning(f"Could not fetch achievement schema: {e}")
+        schema = load_achievements_cache(ACHIEVEMENTS_TABLE, app_id)
+    if not schema:
+        # Without a schema there is no progress to show, so don't ask for it
+        return schema, None
     try:
-        response = requests.get(url, params=params)
-        if response.status_code == 200:
-            data = response.json()
-            achievements = data.get("playerstats", {}).get("achievements", [])
-            return achievements
+        player_achievements = get_player_achievements(api_key, steamid, app_id)
     except Exception as e:
         st.warning(f"Could not fetch player achievements: {e}")
-    return None
+        player_achievements = load_achievements_cache(PLAYER_ACHIEVEMENTS_TABLE, app_id)
+    return schema, player_achievements
+
+# Steam's exact category descriptions behind each feature flag in the details panel
+CATEGORY_FEATURES = {
+    'Cloud Saves': {'Steam Cloud'},
+    'Family Sharing': {'Family Sharing'},
+    'Remote Play': {'Remote Play on TV', 'Remote Play Together', 'Remote Play on Phone', 'Remote Play on Tablet'},
+}
+
+def get_store_link(app_id):
+    """Get the markdown link to a game's Steam Store page"""
+    return f"[View on Steam Store](https://store.steampowered.com/app/{app_id})"
+
+def render_game_details(game_details, app_id):
+    """Render the Store details panel of a rolled game (description, reviews, requirements, features)"""
+    # Text lines are collected and sent as one st.markdown element rather than
+    # one st.write each; they are only flushed early before the expander widget
+    parts = []
+    
+    # Short description
+    if 'short_description' in game_details:
+        description = game_details['short_description']
+        parts.append("**Description:**")
+        parts.append(description)
+    
+    # Steam user rating
+    total_recommendations = (game_details.get('recommendations') or {}).get('total', 0)
+    if total_recommendations > 0:
+        parts.append(f"**Total Steam Reviews:** {total_recommendations:,}")
+        parts.append("💡 *Note: Steam rating (Very Positive, etc.) requires additional API access*")
+    
+    # User score (if available)
+    metacritic_url = (game_details.get('metacritic') or {}).get('url')
+    if metacritic_url:
+        parts.append(f"**User Score:** [View on Metacritic]({metacritic_url})")
+    
+    # PC Requirements
+    pc_req = game_details.get('pc_requirements')
+    if pc_req:
+        if parts:
+            st.markdown("\n\n".join(parts))
+            parts = []
+        with st.expander("💻 PC Requirements"):
+            # A dict holds labelled minimum/recommended sections; anything else is one unlabelled block
+            if isinstance(pc_req, dict):
+                sections = [(label, pc_req[label]) for label in ('minimum', 'recommended') if label in pc_req]
+            else:
+                sections = [('', pc_req)]
+            for label, requirements in sections:
+                if label:
+                    st.write(f"**{label.title()}:**")
+                st.text(clean_html_text(requirements))
+    
+    # DRM Notice
+    drm_notice = game_details.get('drm_notice')
+    if drm_notice:
+        parts.append(f"**DRM:** {drm_notice}")
+    
+    # Age Rating
+    if 'required_age' in game_details:
+        try:
+            age = int(game_details['required_age'])
+            if age > 0:
+                parts.append(f"**Age Rating:** {age}+")
+        except (ValueError, TypeError):
+            # If required_age is not a valid number, skip it
+            pass
+    
+    # Languages
+    if 'supported_languages' in game_details:
+        clean_languages = clean_html_text(game_details['supported_languages'])
+        parts.append(f"**Languages:** {clean_languages}")
+    
+    # Categories (Single-player, Multi-player, etc.), also used for the feature flags below
+    category_descriptions = [cat.get('description', '') for cat in game_details.get('categories') or []]
+    if category_descriptions:
+        parts.append(f"**Categories:** {', '.join(category_descriptions)}")
+    
+    # Price Info
+    price_info = game_details.get('price_overview')
+    if price_info:
+        final, final_price, original_price = (
+            price_info.get('final'), price_info.get('final_formatted', 'N/A'), price_info.get('initial_formatted', 'N/A')
+        )
+        if final == 0:
+            parts.append("**Price:** Free")
+        elif 'N/A' not in (final_price, original_price) and final_price != original_price:
+            # Only call it a sale when both prices are actually known
+            parts.append(f"**Price:** ~~{original_price}~~ **{final_price}** (on sale!)")
+        else:
+            parts.append(f"**Price:** {final_price}")
+    
+    # Developer & Publisher
+    developers = game_details.get('developers')
+    if developers:
+        parts.append(f"**Developer:** {', '.join(developers)}")
+    publishers = game_details.get('publishers')
+    if publishers:
+        parts.append(f"**Publisher:** {', '.join(publishers)}")
+    
+    # Platform Support
+    platform_flags = game_details.get('platforms') or {}
+    platforms = [name for key, name in (('windows', "Windows"), ('mac', "Mac"), ('linux', "Linux")) if platform_flags.get(key)]
+    if platforms:
+        parts.append(f"**Platforms:** {', '.join(platforms)}")
+    
+    # Controller Support
+    controller_support = game_details.get('controller_support')
+    if controller_support:
+        parts.append(f"**Controller:** {controller_support}")
+    
+    # Cloud Saves, Family Sharing and Remote Play, from the categories collected above
+    category_set = set(category_descriptions)
+    for feature, feature_categories in CATEGORY_FEATURES.items():
+        if not category_set.isdisjoint(feature_categories):
+            parts.append(f"**{feature}:** ✅ Supported")
+    
+    # Steam store link
+    if app_id:
+        parts.append(get_store_link(app_id))
+    
+    if parts:
+        st.markdown("\n\n".join(parts))
 
 # --- Streamlit App ---
 st.set_page_config(
@@ -284,6 +876,9 @@ st.markdown("""
 if 'games' not in st.session_state:
     st.session_state.games = None
 
+if 'games_df' not in st.session_state:
+    st.session_state.games_df = None
+
 if 'rolled_games' not in st.session_state:
     st.session_state.rolled_games = set()
 
@@ -304,7 +899,8 @@ if 'selected_game' in st.session_state and st.session_state.selected_game:
     app_id = st.session_state.selected_game.get('appid')
     if app_id:
         try:
-            banner_url = get_game_banner_url(app_id)
+            # Mode isn't known yet up here, so only use an image a roll already downloaded
+            banner_url = get_cached_image_path(app_id, download=False) or get_game_banner_url(app_id)
             st.image(banner_url, use_container_width=True)
         except:
             st.info("🎮 Game image not available")
@@ -341,14 +937,24 @@ with st.expander("⚙️ Setup & Configuration", expanded=False):
     # SteamID input (needed for both modes)
     steamid = st.text_input("SteamID64", value=env_steamid)
 
+    # Restore the games already rolled for this SteamID
+    if steamid and st.session_state.get('rolled_steamid') != steamid:
+        st.session_state.rolled_games = load_rolled_games(steamid)
+        st.session_state.rolled_steamid = steamid
+
     # After steamid is set, handle Offline Mode cache loading
     if mode == "Offline Mode" and steamid:
-        cached_games, cache_timestamp = load_cache_data(steamid)
-        if cached_games:
-            st.session_state.games = cached_games
-        else:
-            st.session_state.games = None
-            st.error("No cached data found for this SteamID. Please switch to Online Mode and fetch your library at least once.")
+        # Only decode the library again when its file changed since the last rerun
+        cache_mtime = get_games_cache_mtime(steamid)
+        if cache_mtime is None or st.session_state.get('games_cache_key') != (steamid, cache_mtime):
+            cached_games, cache_timestamp = load_cache_data(steamid)
+            if cached_games:
+                set_games(cached_games, cache_key=(steamid, get_games_cache_mtime(steamid)))
+            else:
+                set_games(None)
+                st.error("No cached data found for this SteamID. Please switch to Online Mode and fetch your library at least once.")
+        if st.session_state.games and time.time() - st.session_state.games_cache_key[1] > GAMES_CACHE_MAX_AGE:
+            st.warning("Cache is older than 7 days. Consider refreshing.")
 
     # Note about sidebar
     st.info("💡 **Tip:** Use the sidebar for cache management")
@@ -365,10 +971,8 @@ with st.expander("⚙️ Setup & Configuration", expanded=False):
         game detail requests safely.
         """)
 
-    # Show game count if games are loaded
-    if st.session_state.games:
-        filtered_games = filter_games_by_playtime(st.session_state.games, 2.0)  # Default 2 hours
-        st.success(f"✅ Found {len(filtered_games)} games with less than 2.0 hours of playtime")
+    # Game count, filled in once the randomizer has filtered the library
+    games_count_banner = st.empty()
 
     if steamid and api_key:
         if mode == "Online Mode":
@@ -385,8 +989,9 @@ with st.expander("⚙️ Setup & Configuration", expanded=False):
             if fetch_games:
                 with st.spinner("Fetching fresh data from Steam..."):
                     try:
+                        get_owned_games.clear()
                         games = get_owned_games(api_key, steamid)
-                        st.session_state.games = games
+                        set_games(games)
                         st.success(f"Found {len(games)} games in your library!")
                         
                         # Cache the data for offline use
@@ -402,18 +1007,17 @@ with st.expander("⚙️ Setup & Configuration", expanded=False):
                         fresh_games = get_owned_games(api_key, steamid)
                         
                         # Update playtime for existing games
+                        existing_by_id = {game['appid']: game for game in st.session_state.games}
                         updated_count = 0
                         for fresh_game in fresh_games:
-                            for existing_game in st.session_state.games:
-                                if existing_game['appid'] == fresh_game['appid']:
-                                    existing_game['playtime_forever'] = fresh_game['playtime_forever']
-                                    updated_count += 1
-                                    break
-                        
+                            existing_game = existing_by_id.get(fresh_game['appid'])
+                            if existing_game:
+                                existing_game['playtime_forever'] = fresh_game['playtime_forever']
+                                updated_count += 1
+
                         # Add new games
-                        existing_appids = {game['appid'] for game in st.session_state.games}
-                        new_games = [game for game in fresh_games if game['appid'] not in existing_appids]
-                        st.session_state.games.extend(new_games)
+                        new_games = [game for game in fresh_games if game['appid'] not in existing_by_id]
+                        set_games(st.session_state.games + new_games)
                         
                         st.success(f"Updated {updated_count} existing games, added {len(new_games)} new games!")
                         
@@ -431,30 +1035,33 @@ with st.expander("⚙️ Setup & Configuration", expanded=False):
                         progress_bar = st.progress(0)
                         status_text = st.empty()
                         
-                        downloaded_count = 0
                         failed_count = 0
                         
-                        for i, game in enumerate(st.session_state.games):
-                            app_id = game.get('appid')
-                            if app_id:
-                                status_text.text(f"Downloading details for: {game['name']} ({i+1}/{total_games})")
+                        # Only games without cached details need a request
+                        missing_games = find_games_missing_details(st.session_state.games)
+                        completed = total_games - len(missing_games)
+                        downloaded_count = completed  # Already cached
+                        progress_bar.progress(completed / total_games)
+                        
+                        # Downloaded details are committed in batches rather than one transaction per game
+                        session = get_http_session()
+                        batch = BatchCommitter(get_details_db())
+                        try:
+                            for game, game_details in fetch_all_game_details(missing_games, session):
+                                completed += 1
+                                status_text.text(f"Downloaded details for: {game['name']} ({completed}/{total_games})")
                                 
-                                # Check if already cached
-                                existing_details = load_game_details_cache(app_id)
-                                if existing_details is None:
-                                    # Download new details
-                                    game_details = get_game_details(app_id)
-                                    if game_details:
-                                        save_game_details_cache(game_details, app_id)
-                                        downloaded_count += 1
-                                    else:
-                                        failed_count += 1
+                                if game_details:
+                                    save_game_details_cache(game_details, game['appid'], commit=False)
+                                    batch.add()
+                                    downloaded_count += 1
                                 else:
-                                    downloaded_count += 1  # Already cached
+                                    failed_count += 1
                                 
                                 # Update progress
-                                progress = (i + 1) / total_games
-                                progress_bar.progress(progress)
+                                progress_bar.progress(completed / total_games)
+                        finally:
+                            batch.commit()
                         
                         progress_bar.empty()
                         status_text.empty()
@@ -474,63 +1081,66 @@ with st.expander("⚙️ Setup & Configuration", expanded=False):
                         total_games = len(st.session_state.games)
                         progress_bar = st.progress(0)
                         status_text = st.empty()
-                        downloaded_count = 0
                         failed_count = 0
-                        achievements_count = 0
-                        for i, game in enumerate(st.session_state.games):
-                            app_id = game.get('appid')
-                            if app_id:
-                                status_text.text(f"Downloading details for: {game['name']} ({i+1}/{total_games})")
-                                # Game details
-                                existing_details = load_game_details_cache(app_id)
-                                if existing_details is None:
-                                    game_details = get_game_details(app_id)
-                                    if game_details:
-                                        save_game_details_cache(game_details, app_id)
-                                        downloaded_count += 1
-                                    else:
-                                        failed_count += 1
-                                else:
-                                    downloaded_count += 1  # Already cached
-                                # Achievements schema
-                                achievements_schema_file = os.path.join("cache/game_details", f"game_{app_id}_achievements.pkl")
-                                if not os.path.exists(achievements_schema_file):
-                                    schema = get_achievement_schema(api_key, app_id)
-                                    if schema:
-                                        with open(achievements_schema_file, 'wb') as f:
-                                            pickle.dump(schema, f)
-                                        achievements_count += 1
+                        
+                        # Game details, fetched concurrently for games not cached yet
+                        missing_games = find_games_missing_details(st.session_state.games)
+                        downloaded_count = total_games - len(missing_games)  # Already cached
+                        session = get_http_session()
+                        batch = BatchCommitter(get_details_db())
+                        try:
+                            for i, (game, game_details) in enumerate(fetch_all_game_details(missing_games, session)):
+                                status_text.text(f"Downloaded details for: {game['name']} ({i+1}/{len(missing_games)})")
+                                if game_details:
+                                    save_game_details_cache(game_details, game['appid'], commit=False)
+                                    batch.add()
+                                    downloaded_count += 1
                                 else:
-                                    achievements_count += 1  # Already cached
-                                # Player achievement progress (new)
-                                player_achievements_file = os.path.join("cache/game_details", f"game_{app_id}_player_achievements.pkl")
-                                if not os.path.exists(player_achievements_file):
-                                    player_achievements = get_player_achievements(api_key, steamid, app_id)
-                                    if player_achievements:
-                                        with open(player_achievements_file, 'wb') as f:
-                                            pickle.dump(player_achievements, f)
-                                # Update progress
-                                progress = (i + 1) / total_games
-                                progress_bar.progress(progress)
+                                    failed_count += 1
+                                progress_bar.progress((i + 1) / len(missing_games))
+                        finally:
+                            batch.commit()
+                        
+                        # Achievement schemas and player progress, fetched concurrently for games not cached yet
+                        games_with_ids = [game for game in st.session_state.games if game.get('appid')]
+                        cached_schema_ids = get_cached_achievement_ids(ACHIEVEMENTS_TABLE)
+                        cached_player_ids = get_cached_achievement_ids(PLAYER_ACHIEVEMENTS_TABLE)
+                        missing_schemas = [game for game in games_with_ids if game['appid'] not in cached_schema_ids]
+                        missing_players = [game for game in games_with_ids if game['appid'] not in cached_player_ids]
+                        achievements_count = len(games_with_ids) - len(missing_schemas)  # Already cached
+                        total_fetches = len(missing_schemas) + len(missing_players)
+                        completed = 0
+                        
+                        try:
+                            schema_results = fetch_for_games(lambda game: fetch_achievement_schema(api_key, game['appid'], session), missing_schemas)
+                            for game, schema in schema_results:
+                                completed += 1
+                                status_text.text(f"Downloaded achievements for: {game['name']} ({completed}/{total_fetches})")
+                                if schema:
+                                    save_achievements_cache(ACHIEVEMENTS_TABLE, schema, game['appid'], commit=False)
+                                    batch.add()
+                                    achievements_count += 1
+                                progress_bar.progress(completed / total_fetches)
+                            
+                            player_results = fetch_for_games(lambda game: fetch_player_achievements(api_key, steamid, game['appid'], session), missing_players)
+                            for game, player_achievements in player_results:
+                                completed += 1
+                                status_text.text(f"Downloaded achievement progress for: {game['name']} ({completed}/{total_fetches})")
+                                if player_achievements:
+                                    save_achievements_cache(PLAYER_ACHIEVEMENTS_TABLE, player_achievements, game['appid'], commit=False)
+                                    batch.add()
+                                progress_bar.progress(completed / total_fetches)
+                        finally:
+                            batch.commit()
                         progress_bar.empty()
                         status_text.empty()
                         st.success(f"Downloaded/cached {downloaded_count} game details, {achievements_count} achievements schemas. {failed_count} failed.")
                     except Exception as e:
                         st.error(f"Error during bulk download: {e}")
 
-        elif mode == "Offline Mode":
-            if steamid:
-                cached_games, cache_timestamp = load_cache_data(steamid)
-                
-                if cached_games:
-                    st.session_state.games = cached_games
-                    # Status shown in sidebar, no need for main screen messages
-                else:
-                    st.error("No cached data found for this SteamID. Switch to Online Mode to fetch data first.")
-
-    # Debug: Show available genres (simple text display)
+    # Debug: Show available genres (simple text display); the list is reused by the sidebar genre filter
     if st.session_state.games:
-        available_genres = get_available_genres(st.session_state.games)
+        available_genres = get_available_genres(st.session_state.games_df)
         if available_genres:
             st.markdown("**🔍 Available Genres in Your Library:**")
             genre_text = ", ".join(available_genres)
@@ -554,7 +1164,6 @@ if st.session_state.games:
         
         # Genre filter
         st.markdown("**🎭 Genre Filter:**")
-        available_genres = get_available_genres(st.session_state.games)
         if available_genres:
             selected_genre = st.selectbox("Select Genre:", ["All Genres"] + available_genres, key="genre_filter")
         else:
@@ -562,22 +1171,27 @@ if st.session_state.games:
             st.info("No genre data available. Use Online Mode to download game details.")
     
     # Filter games by playtime
-    filtered_games = filter_games_by_playtime(st.session_state.games, max_hours)
+    games_df = st.session_state.games_df
+    mask = get_playtime_mask(games_df, max_hours)
+    games_count_banner.success(f"✅ Found {np.count_nonzero(mask)} games with less than {max_hours} hours of playtime")
     
     # Filter by genre
-    filtered_games = filter_games_by_genre(filtered_games, selected_genre)
+    mask &= get_genre_mask(games_df, selected_genre, get_genre_index(games_df))
     
     # Filter out previously rolled games if option is enabled
     if exclude_rolled and st.session_state.rolled_games:
-        available_games = [game for game in filtered_games if game['appid'] not in st.session_state.rolled_games]
-        excluded_count = len(filtered_games) - len(available_games)
+        rolled_mask = get_rolled_mask(games_df, st.session_state.rolled_games)
+        excluded_count = np.count_nonzero(mask & rolled_mask)
         if excluded_count > 0:
             st.info(f"Excluded {excluded_count} previously rolled games")
-        filtered_games = available_games
+        mask &= ~rolled_mask
+    
+    # Positions in st.session_state.games of the games left to roll from
+    candidates = np.flatnonzero(mask)
     
-    if filtered_games:
+    if len(candidates) > 0:
         # Show current filter status
-        filter_info = f"🎯 **{len(filtered_games)} games available**"
+        filter_info = f"🎯 **{len(candidates)} games available**"
         if selected_genre != "All Genres":
             filter_info += f" in **{selected_genre}** genre"
         filter_info += f" with **< {max_hours} hours** playtime"
@@ -590,12 +1204,14 @@ if st.session_state.games:
         
         # Handle button click outside the column to avoid scope issues
         if roll_button:
-            selected_game = random.choice(filtered_games)
+            selected_game = st.session_state.games[candidates[RNG.integers(len(candidates))]]
             playtime_hours = selected_game.get('playtime_forever', 0) / 60
             app_id = selected_game.get('appid')
             
             # Add to rolled games set
             st.session_state.rolled_games.add(app_id)
+            if steamid:
+                save_rolled_games(st.session_state.rolled_games, steamid)
             
             # Store selected game in session state for banner display
             st.session_state.selected_game = selected_game
@@ -626,7 +1242,7 @@ if st.session_state.games:
                 if app_id:
                     image_loaded = False
                     try:
-                        image_url = get_game_image_url(app_id)
+                        image_url = get_cached_image_path(app_id, download=mode == "Online Mode") or get_game_image_url(app_id)
                         st.image(image_url, caption=selected_game['name'], use_container_width=True)
                         image_loaded = True
                     except:
@@ -658,8 +1274,8 @@ if st.session_state.games:
                     
                     # Genres
                     if 'genres' in game_details:
-                        genres = [genre['description'] for genre in game_details['genres']]
-                        st.write(f"**Genres:** {', '.join(genres[:3])}")  # Show first 3 genres
+                        genres = ', '.join(genre['description'] for genre in game_details['genres'][:3])
+                        st.write(f"**Genres:** {genres}")  # Show first 3 genres
                     
                     # Metacritic score
                     if 'metacritic' in game_details and game_details['metacritic'].get('score'):
@@ -669,152 +1285,51 @@ if st.session_state.games:
                     # Achievements display (only in Online Mode, with API key and SteamID)
                     if app_id:
                         if mode == "Online Mode" and api_key and steamid:
-                            schema = get_achievement_schema(api_key, app_id)
-                            player_achievements = get_player_achievements(api_key, steamid, app_id)
+                            schema, player_achievements = get_achievements_online(api_key, steamid, app_id)
                         elif mode == "Offline Mode":
                             # Load cached schema and player achievements if available
-                            schema = None
-                            player_achievements = None
-                            achievements_schema_file = os.path.join("cache/game_details", f"game_{app_id}_achievements.pkl")
-                            player_achievements_file = os.path.join("cache/game_details", f"game_{app_id}_player_achievements.pkl")
-                            if os.path.exists(achievements_schema_file):
-                                with open(achievements_schema_file, 'rb') as f:
-                                    schema = pickle.load(f)
-                            if os.path.exists(player_achievements_file):
-                                with open(player_achievements_file, 'rb') as f:
-                                    player_achievements = pickle.load(f)
+                            schema = load_achievements_cache(ACHIEVEMENTS_TABLE, app_id)
+                            player_achievements = load_achievements_cache(PLAYER_ACHIEVEMENTS_TABLE, app_id)
                         else:
                             schema = None
                             player_achievements = None
+                        # A non-empty schema means total_achievements > 0, so games without
+                        # achievements never get the line or the progress bar
                         if schema and player_achievements:
                             total_achievements = len(schema)
                             completed_achievements = sum(1 for a in player_achievements if a.get("achieved") == 1)
-                            percent = (completed_achievements / total_achievements) * 100 if total_achievements > 0 else 0
-                            st.write(f"**Achievements:** {completed_achievements} / {total_achievements} ({percent:.0f}%)")
-                            st.progress(percent / 100)
-                    
-                    # Short description
-                    if 'short_description' in game_details:
-                        description = game_details['short_description']
-                        st.write("**Description:**")
-                        st.write(description)
-                    
-                    # Steam user rating
-                    if 'recommendations' in game_details:
-                        total_recommendations = game_details['recommendations'].get('total', 0)
-                        if total_recommendations > 0:
-                            st.write(f"**Total Steam Reviews:** {total_recommendations:,}")
-                            st.write("💡 *Note: Steam rating (Very Positive, etc.) requires additional API access*")
-                    
-                    # User score (if available)
-                    if 'metacritic' in game_details and game_details['metacritic'].get('url'):
-                        st.write(f"**User Score:** [View on Metacritic]({game_details['metacritic']['url']})")
-                    
-                    # PC Requirements
-                    if 'pc_requirements' in game_details and game_details['pc_requirements']:
-                        with st.expander("💻 PC Requirements"):
-                            if isinstance(game_details['pc_requirements'], dict):
-                                if 'minimum' in game_details['pc_requirements']:
-                                    st.write("**Minimum:**")
-                                    clean_min = clean_html_text(game_details['pc_requirements']['minimum'])
-                                    st.text(clean_min)
-                                if 'recommended' in game_details['pc_requirements']:
-                                    st.write("**Recommended:**")
-                                    clean_rec = clean_html_text(game_details['pc_requirements']['recommended'])
-                                    st.text(clean_rec)
-                            else:
-                                clean_req = clean_html_text(game_details['pc_requirements'])
-                                st.text(clean_req)
-                    
-                    # DRM Notice
-                    if 'drm_notice' in game_details and game_details['drm_notice']:
-                        st.write(f"**DRM:** {game_details['drm_notice']}")
-                    
-                    # Age Rating
-                    if 'required_age' in game_details:
-                        try:
-                            age = int(game_details['required_age'])
-                            if age > 0:
-                                st.write(f"**Age Rating:** {age}+")
-                        except (ValueError, TypeError):
-                            # If required_age is not a valid number, skip it
-                            pass
-                    
-                    # Languages
-                    if 'supported_languages' in game_details:
-                        clean_languages = clean_html_text(game_details['supported_languages'])
-                        st.write(f"**Languages:** {clean_languages}")
-                    
-                    # Categories (Single-player, Multi-player, etc.)
-                    if 'categories' in game_details and game_details['categories']:
-                        categories = [cat['description'] for cat in game_details['categories']]
-                        st.write(f"**Categories:** {', '.join(categories)}")
+                            fraction = min(completed_achievements / total_achievements, 1.0)
+                            st.write(f"**Achievements:** {completed_achievements} / {total_achievements} ({fraction:.0%})")
+                            st.progress(fraction)
                     
-                    # Price Info
-                    if 'price_overview' in game_details and game_details['price_overview']:
-                        price_info = game_details['price_overview']
-                        if price_info.get('final') == 0:
-                            st.write("**Price:** Free")
-                        else:
-                            final_price = price_info.get('final_formatted', 'N/A')
-                            original_price = price_info.get('initial_formatted', 'N/A')
-                            if final_price != original_price:
-                                st.write(f"**Price:** ~~{original_price}~~ **{final_price}** (on sale!)")
-                            else:
-                                st.write(f"**Price:** {final_price}")
-                    
-                    # Developer & Publisher
-                    if 'developers' in game_details and game_details['developers']:
-                        st.write(f"**Developer:** {', '.join(game_details['developers'])}")
-                    if 'publishers' in game_details and game_details['publishers']:
-                        st.write(f"**Publisher:** {', '.join(game_details['publishers'])}")
-                    
-                    # Platform Support
-                    platforms = []
-                    if game_details.get('platforms', {}).get('windows', False):
-                        platforms.append("Windows")
-                    if game_details.get('platforms', {}).get('mac', False):
-                        platforms.append("Mac")
-                    if game_details.get('platforms', {}).get('linux', False):
-                        platforms.append("Linux")
-                    if platforms:
-                        st.write(f"**Platforms:** {', '.join(platforms)}")
-                    
-                    # Controller Support
-                    if 'controller_support' in game_details and game_details['controller_support']:
-                        st.write(f"**Controller:** {game_details['controller_support']}")
-                    
-                    # Cloud Saves
-                    if 'categories' in game_details and game_details['categories']:
-                        cloud_save = any('Cloud Saves' in cat.get('description', '') for cat in game_details['categories'])
-                        if cloud_save:
-                            st.write("**Cloud Saves:** ✅ Supported")
-                    
-                    # Family Sharing
-                    if 'categories' in game_details and game_details['categories']:
-                        family_sharing = any('Family Sharing' in cat.get('description', '') for cat in game_details['categories'])
-                        if family_sharing:
-                            st.write("**Family Sharing:** ✅ Supported")
-                    
-                    # Remote Play
-                    if 'categories' in game_details and game_details['categories']:
-                        remote_play = any('Remote Play' in cat.get('description', '') for cat in game_details['categories'])
-                        if remote_play:
-                            st.write("**Remote Play:** ✅ Supported")
+                    render_game_details(game_details, app_id)
+                elif app_id:
+                    # Steam store link (part of the details markdown when there are details)
+                    st.markdown(get_store_link(app_id))
                 
-                # Steam store link
-                if app_id:
-                    st.markdown(f"[View on Steam Store](https://store.steampowered.com/app/{app_id})")
-                
-                # Store game details in session state for sidebar
+                # Keep only the fields the banner needs in session state, not the whole
+                # details dict with its HTML blobs; 'appid' is what the banner looks up
                 if game_details:
-                    st.session_state.selected_game = game_details
+                    st.session_state.selected_game = {
+                        'appid': app_id,
+                        'name': game_details.get('name', selected_game['name']),
+                    }
 
     else:
         if exclude_rolled and st.session_state.rolled_games:
             st.warning(f"No more games available with less than {max_hours} hours of playtime. You've rolled all available games!")
             if st.button("🔄 Reset Rolled Games"):
                 st.session_state.rolled_games.clear()
+                if steamid:
+                    save_rolled_games(st.session_state.rolled_games, steamid)
                 st.rerun()
         else:
-            st.warning(f"No games found with less than {max_hours} hours of playtime. Try increasing the playtime limit!") 
\ No newline at end of file
+            st.warning(f"No games found with less than {max_hours} hours of playtime. Try increasing the playtime limit!")
+
+# Cache management in sidebar
+with st.sidebar:
+    st.markdown("**🗂️ Cache Management:**")
+    if st.button("📊 Cache Stats"):
+        file_count, total_size = get_cache_stats()
+        st.write(f"**Cached files:** {file_count}")
+        st.write(f"**Total size:** {total_size / (1024 * 1024):.2f} MB")